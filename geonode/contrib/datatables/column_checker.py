@@ -9,12 +9,23 @@ Attempting such a join will throw a Postgres error anyway--this is give a better
 error message.
 """
 import logging
-import psycopg2
-from geonode.contrib.msg_util import msg, msgt
-from geonode.contrib.datatables.db_helper import get_datastore_connection_string
+from collections import namedtuple
+from contextlib import closing
+from geonode.contrib.datatables.db_helper import datastore_connection,\
+                                                quote_identifier
 
 LOGGER = logging.getLogger('geonode.contrib.datatables.column_checker')
 
+ERR_MSG_INCOMPATIBLE_COLUMNS = '<br />Your chosen column "%s" is type %s.'\
+                '  However, the chosen layer column "%s" is type %s'
+
+TYPE_TEXT_CHARACTER = 'a "character"'
+TYPE_TEXT_NUMERIC = 'a "numeric"'
+TYPE_TEXT_OTHER = 'neither a character nor a numeric'
+
+# Outcome of ColumnChecker._evaluate_join()
+JoinResult = namedtuple('JoinResult', 'ok clause err')
+
 from geonode.contrib.datatables.column_helper import ColumnHelper
 
 
@@ -34,7 +45,7 @@ class ColumnChecker(object):
     else:
         print 'failed b/c: %s' % user_err_msg
 
-    # (2) get_column_join_stmt(with_casting=True)
+    # (2) get_column_join_stmt()
 
     (success, join_stmt_or_err_msg) = column_checker.get_column_join_stmt()
     if success:
@@ -51,133 +62,172 @@ class ColumnChecker(object):
         self.dt_attribute = dt_attribute
 
 
-    def is_character_column(self, data_type):
+    def is_character_column(self, type_category):
         """
-        Check the data_type string against known postgres character datatypes
+        Check the pg_type.typcategory for the string category
         """
-        return ColumnHelper.is_character_column(data_type)
+        return ColumnHelper.is_character_category(type_category)
 
-    def is_numeric_column(self, data_type):
+    def is_numeric_column(self, type_category):
         """
-        Check the data_type string against known postgres character datatypes
+        Check the pg_type.typcategory for the numeric category
         """
-        return ColumnHelper.is_numeric_column(data_type)
+        return ColumnHelper.is_numeric_category(type_category)
 
-    def get_column_join_stmt(self, with_casting=True):
+    def is_same_column(self):
         """
-        when creating a Table csvkit turns quoted
-
-        Join statement possibilities:
-
-        (1) same type
-            target_table."attribute name A" = data_table."attribute name B"
-
-        (2) target is char, DataTable is numeric
-
-            Currently, returns an error.
-
-            Commented out: you can explicitly alter the DataTable column, changing it from
-            numeric to character.  This is great for combined Upload + Join
-            commands.  However, it is dangerous if trying to join to an
-            already uplodated DataTable.
-
-        (3) target is numeric, datatable is char
-
-            Doesn't work.  We don't want to explicitly change the target layer
+        Are the target and DataTable columns the same column of the same table?
+        """
+        if self.target_table is None or self.dt_table is None:
+            return False
 
-        (4) one of the attributes is unknown
+        return self.target_table.split(':')[-1] == self.dt_table.split(':')[-1]\
+                and self.target_attribute == self.dt_attribute
 
-            error message
+    def _get_both_datatypes(self):
+        """
+        Retrieve the target and DataTable join column data types
+        in a single query
 
-        (True, join_stmt)
+        (True, (target ColumnType, datatable ColumnType))
         (False, error message)
         """
+        if None in (self.target_table, self.target_attribute,\
+                    self.dt_table, self.dt_attribute):
+            return (False, "The table_name and table_attribute must be specified.")
 
-        # Target layer, join column data type
-        (retrieved, target_data_type) = ColumnHelper.get_column_datatype(\
-                            self.target_table, self.target_attribute)
+        target_key = (self.target_table.split(':')[-1], self.target_attribute)
+        dt_key = (self.dt_table.split(':')[-1], self.dt_attribute)
+
+        (retrieved, data_types) = ColumnHelper.get_column_datatypes_batch(\
+                                    [target_key, dt_key])
         if not retrieved:
             return (False, 'Sorry, the target column is not available.')
 
+        # Target layer, join column data type
+        target_type = data_types.get(target_key)
+        if target_type is None:
+            return (False, 'Sorry, the target column is not available.')
+
         # Table to join, column data type
-        (was_retrieved, datatable_data_type) =\
-            ColumnHelper.get_column_datatype(self.dt_table, self.dt_attribute)
-        if not was_retrieved:
+        datatable_type = data_types.get(dt_key)
+        if datatable_type is None:
             return (False, 'The data type of your column was not available')
 
+        return (True, (target_type, datatable_type))
+
+    def _evaluate_join(self, with_casting=False):
+        """
+        Retrieve both column data types (one query) and check
+        whether the columns may be joined.
+
+        Returns a JoinResult:
+            JoinResult(ok=True, clause=join clause, err=None)
+            JoinResult(ok=False, clause=None, err=error message)
+
+        Use this directly when both the compatibility check
+        and the join clause are needed.
+        """
         join_clause = '%s."%s" = %s."%s"' % (self.target_table,\
                                 self.target_attribute,\
                                 self.dt_table,\
                                 self.dt_attribute)
 
-        varchar_str = '::varchar'
+        # Joining a column to itself?  Same type, no need to look it up
+        if self.is_same_column():
+            return JoinResult(True, join_clause, None)
+
+        (retrieved, data_types_or_err_msg) = self._get_both_datatypes()
+        if not retrieved:
+            return JoinResult(False, None, data_types_or_err_msg)
+        (target_type, datatable_type) = data_types_or_err_msg
+        target_category = target_type.type_category
+        datatable_category = datatable_type.type_category
 
         # Are columns types the same?  OK
-        if target_data_type == datatable_data_type:
-            return (True, join_clause)
+        if target_type.data_type == datatable_type.data_type:
+            return JoinResult(True, join_clause, None)
 
-        """
-        msgt('%s.%s' % (self.target_table,\
-                                self.target_attribute))
-        msg('target_data_type: %s' % target_data_type)
-        msg('target_data_type is_character_column: %s' % self.is_character_column(target_data_type))
-
-        msg('target_data_type is_numeric_column: %s' % self.is_numeric_column(target_data_type))
-        msgt('%s.%s' % (self.dt_table,\
-                self.dt_attribute))
-
-        msg('datatable_data_type: %s' % datatable_data_type)
-        msg('datatable_data_type is_character_column: %s' % self.is_character_column(datatable_data_type))
-        msg('datatable_data_type is_numeric_column: %s' % self.is_numeric_column(datatable_data_type))
-        """
         # Are columns types both character? OK
         #
-        if self.is_character_column(target_data_type) and\
-            self.is_character_column(datatable_data_type):
-            return (True, join_clause)
+        if self.is_character_column(target_category) and\
+            self.is_character_column(datatable_category):
+            return JoinResult(True, join_clause, None)
 
         # Are columns types both numeric? OK
         #
-        if self.is_numeric_column(target_data_type) and\
-            self.is_numeric_column(datatable_data_type):
-            return (True, join_clause)
+        if self.is_numeric_column(target_category) and\
+            self.is_numeric_column(datatable_category):
+            return JoinResult(True, join_clause, None)
 
         if with_casting is True:
-            #   Target is char but datatable is numeric,
-            #   Cast datatable to varchar
-            #
-
-            if self.is_character_column(target_data_type) and\
-                self.is_numeric_column(datatable_data_type):
-                pass
-                """
-                #Handling this upstream instead, explicitly changing
-                #DataTable upload to force a specified column to be char
-
-                success, msg = self.alter_column_to_var(self.dt_table,\
-                                self.dt_attribute)
-                if success:
-                    return True, join_clause
-                else:
-                    return False, msg
-                """
+            casted_join_clause = self._build_casted_join_clause(\
+                                    target_category, datatable_category)
+            if casted_join_clause is not None:
+                return JoinResult(True, casted_join_clause, None)
 
-            #   Target is char but datatable is numeric,
-            #   Cast datatable COLUMN to varchar
-            #
-            if self.is_numeric_column(target_data_type) and\
-                self.is_character_column(datatable_data_type):
-                pass
+        target_type_text = self.get_type_text_char_or_numeric(target_category)
+        dt_type_text = self.get_type_text_char_or_numeric(datatable_category)
 
+        err_msg = ERR_MSG_INCOMPATIBLE_COLUMNS % (self.dt_attribute, dt_type_text,\
+                                self.target_attribute, target_type_text)
 
-        target_type_text = self.get_type_text_char_or_numeric(target_data_type)
-        dt_type_text = self.get_type_text_char_or_numeric(datatable_data_type)
+        return JoinResult(False, None, err_msg)
 
-        err_msg = '<br />Your chosen column "{0}" is type {1}.  However, the chosen layer column "{2}" is type {3}'.format(\
-                self.dt_attribute, dt_type_text, self.target_attribute, target_type_text)
+    def get_column_join_stmt(self, with_casting=False):
+        """
+        when creating a Table csvkit turns quoted
 
-        return (False, err_msg)
+        Join statement possibilities:
 
+        (1) same type
+            target_table."attribute name A" = data_table."attribute name B"
+
+        (2) target is char, DataTable is numeric
+
+            with_casting=False (default): error message
+
+            with_casting=True: the DataTable column is cast to varchar
+                within the join clause.  (The DataTable itself is not altered.)
+                Only use this when the values are known to match as text:
+                the cast doesn't zero-pad or drop decimals, so a target
+                '000125' won't match 125 ('125') and a numeric(10,2)
+                125 becomes '125.00'.  Those rows silently go unmatched.
+
+        (3) target is numeric, datatable is char
+
+            Doesn't work.  We don't want to explicitly change the target layer
+
+        (4) one of the attributes is unknown
+
+            error message
+
+        (True, join_stmt)
+        (False, error message)
+        """
+
+        join_result = self._evaluate_join(with_casting=with_casting)
+        if join_result.ok:
+            return (True, join_result.clause)
+        return (False, join_result.err)
+
+    def _build_casted_join_clause(self, target_category, datatable_category):
+        """
+        Target is char but datatable is numeric:
+            Cast the datatable column to varchar within the join clause
+            (see the with_casting notes in get_column_join_stmt)
+
+        Any other combination returns None--e.g. we don't want to
+        cast the target layer column.
+        """
+        if self.is_character_column(target_category) and\
+            self.is_numeric_column(datatable_category):
+            return '%s."%s" = %s."%s"::varchar' % (self.target_table,\
+                                self.target_attribute,\
+                                self.dt_table,\
+                                self.dt_attribute)
+
+        return None
 
     def alter_column_to_var(self, table_name, attr_name):
 
@@ -187,22 +237,20 @@ class ColumnChecker(object):
         if attr_name is None:
             return False, 'attr_name cannot be None'
 
-        stmt = "ALTER TABLE {0} ALTER COLUMN".format(table_name) + \
-            " {0} TYPE varchar(255) USING {0}::varchar;".format(attr_name)
+        stmt = "ALTER TABLE {0} ALTER COLUMN".format(quote_identifier(table_name)) + \
+            " {0} TYPE varchar(255) USING {0}::varchar;".format(quote_identifier(attr_name))
 
         try:
-            conn = psycopg2.connect(get_datastore_connection_string())
-
-            cur = conn.cursor()
-            cur.execute(stmt)
-            conn.commit()
+            with datastore_connection() as conn:
+                with closing(conn.cursor()) as cur:
+                    cur.execute(stmt)
+                conn.commit()
+            ColumnHelper.invalidate_cache(table_name)
             return True, None
 
         except Exception as e:
             LOGGER.error('Exception running SQL stmt %s:\n%s', stmt, e)
             return False, "Error when trying to convert numeric column to character"
-        finally:
-            conn.close()
         #ALTER TABLE presales ALTER COLUMN code TYPE numeric(10,0) USING code::numeric;
 
 
@@ -218,52 +266,21 @@ class ColumnChecker(object):
             However, the user's table is numberic (b/c of Excel) e.g. 125
         """
 
-        # Target layer, join column data type
-        (retrieved, target_data_type) = ColumnHelper.get_column_datatype(\
-                    self.target_table, self.target_attribute)
-        if not retrieved:
-            return (False, 'Sorry, the target column is not available.')
-
-        # Table to join, column data type
-        (was_retrieved, datatable_data_type) = ColumnHelper.get_column_datatype(\
-                self.dt_table, self.dt_attribute)
-        if not was_retrieved:
-            return (False, 'The data type of your column was not available')
-
-        # Are columns types the same?  OK
-        if target_data_type == datatable_data_type:
+        join_result = self._evaluate_join()
+        if join_result.ok:
             return (True, None)
+        return (False, join_result.err)
 
-        # Are columns types both character? OK
-        #
-        if self.is_character_column(target_data_type) and\
-            self.is_character_column(datatable_data_type):
-            return (True, None)
-
-        # Are columns types both numeric? OK
-        #
-        if self.is_numeric_column(target_data_type) and\
-            self.is_numeric_column(datatable_data_type):
-            return (True, None)
-
-        target_type_text = self.get_type_text_char_or_numeric(target_data_type)
-        dt_type_text = self.get_type_text_char_or_numeric(datatable_data_type)
-
-        err_msg = '<br />Your chosen column "{0}" is type {1}.  However, the chosen layer column "{2}" is type {3}'.format(\
-        self.dt_attribute, dt_type_text, self.target_attribute, target_type_text)
-
-        return (False, err_msg)
-
-    def get_type_text_char_or_numeric(self, data_type):
+    def get_type_text_char_or_numeric(self, type_category):
         """
         Help for formatting an error message
         """
-        if data_type is None:
+        if type_category is None:
             return None
 
-        if self.is_character_column(data_type):
-            return 'a "character"'
-        elif self.is_numeric_column(data_type):
-            return 'a "numeric"'
+        if self.is_character_column(type_category):
+            return TYPE_TEXT_CHARACTER
+        elif self.is_numeric_column(type_category):
+            return TYPE_TEXT_NUMERIC
         else:
-            return 'neither a character nor a numeric'
+            return TYPE_TEXT_OTHER
@@ -7,21 +7,34 @@ Convenience methods to:
 
 Used before attempting a SQL join between a Layer column and a DataTable column.
 """
-import sys
-import traceback
+import time
 import logging
-import psycopg2
+from collections import namedtuple
+from contextlib import closing
 #from geonode.contrib.msg_util import msg, msgt
-from geonode.contrib.datatables.db_helper import get_datastore_connection_string
+from geonode.contrib.datatables.db_helper import datastore_connection
 
 LOGGER = logging.getLogger('geonode.contrib.datatables.column_helper')
 
 
-POSTGRES_CHAR_DATATYPES = ('character varying', 'varchar', 'character',\
-                            'char', 'text')
-POSTGRES_NUMERIC_DATATYPES = ('smallint', 'integer', 'bigint', 'decimal',\
+POSTGRES_CHAR_DATATYPES = frozenset(['character varying', 'varchar', 'character',\
+                            'char', 'text'])
+POSTGRES_NUMERIC_DATATYPES = frozenset(['smallint', 'integer', 'bigint', 'decimal',\
                             'numeric', 'real', 'double precision',\
-                            'smallserial', 'serial', 'bigserial')
+                            'smallserial', 'serial', 'bigserial'])
+
+# pg_type.typcategory values
+# Domains and other types built on these share the same category
+TYPE_CATEGORY_STRING = 'S'
+TYPE_CATEGORY_NUMERIC = 'N'
+
+# A column's data type name, e.g. 'character varying', and its pg_type.typcategory
+ColumnType = namedtuple('ColumnType', 'data_type type_category')
+
+# Column data types rarely change between join attempts.
+# { (table_name, table_attribute) : (time retrieved, ColumnType) }
+_DATATYPE_CACHE = {}
+_CACHE_TTL = 300    # seconds
 
 
 class ColumnHelper(object):
@@ -42,27 +55,101 @@ class ColumnHelper(object):
 
         table_name = table_name.split(':')[-1]  # e.g. geonode:some-table-name
 
-        sql_target_data_type = "SELECT data_type " +\
-                "FROM information_schema.columns " +\
-                "WHERE table_name = '{0}' AND column_name='{1}';".format(\
-                table_name, table_attribute)
+        (success, types_or_err_msg) = ColumnHelper.get_column_datatypes_batch(\
+                                    [(table_name, table_attribute)])
+        if not success:
+            return (False, types_or_err_msg)
+
+        column_type = types_or_err_msg.get((table_name, table_attribute))
+        if column_type is None:
+            err_msg = "Error finding data type for column '%s' in table '%s'"\
+                    % (table_attribute, table_name)
+            LOGGER.error(err_msg)
+            return (False, err_msg)
+
+        return (True, column_type.data_type)
 
-        #msg ('sql_target_data_type: %s' % sql_target_data_type)
+    @classmethod
+    def get_column_datatypes_batch(cls, pairs):
+        """
+        Retrieve the data types (and type categories) of several columns
+        in a single query
+
+        pairs: list of (table_name, table_attribute) tuples
+
+        Reads pg_catalog directly rather than information_schema.columns,
+        which is a slow view over the same catalog tables.
+
+        (True, {(table_name, table_attribute) : ColumnType, ...})
+        (False, error message)
+
+        Columns that are not found are left out of the dict.
+        """
+        if not pairs:
+            return (False, "At least one (table_name, table_attribute) pair must be specified.")
+
+        for table_name, table_attribute in pairs:
+            if table_name is None or table_attribute is None:
+                return (False, "The table_name and table_attribute must be specified.")
+
+        pairs = tuple([(t.split(':')[-1], a) for t, a in pairs])
+
+        # Use cached data types where available, only query for the rest
+        data_types = {}
+        now = time.time()
+        for pair in pairs:
+            cached = _DATATYPE_CACHE.get(pair)
+            if cached is None:
+                continue
+            if now - cached[0] < _CACHE_TTL:
+                data_types[pair] = cached[1]
+            else:
+                _DATATYPE_CACHE.pop(pair, None)     # expired
+
+        pairs = tuple([pair for pair in pairs if pair not in data_types])
+        if not pairs:
+            return (True, data_types)
+
+        sql_data_types = "SELECT c.relname, a.attname," +\
+                " format_type(a.atttypid, NULL), t.typcategory" +\
+                " FROM pg_catalog.pg_attribute a" +\
+                " JOIN pg_catalog.pg_class c ON a.attrelid = c.oid" +\
+                " JOIN pg_catalog.pg_type t ON a.atttypid = t.oid" +\
+                " WHERE (c.relname, a.attname) IN %s" +\
+                " AND a.attnum > 0 AND NOT a.attisdropped;"
 
         try:
-            conn = psycopg2.connect(get_datastore_connection_string())
-            cur = conn.cursor()
-            cur.execute(sql_target_data_type)
-            data_type = cur.fetchone()[0]
-            return (True, data_type)
+            with datastore_connection() as conn:
+                with closing(conn.cursor()) as cur:
+                    cur.execute(sql_data_types, (pairs,))
+                    rows = cur.fetchall()
+                conn.rollback()     # read only, don't leave the transaction open
+            for (table_name, table_attribute, data_type, type_category) in rows:
+                column_type = ColumnType(data_type, type_category)
+                data_types[(table_name, table_attribute)] = column_type
+                _DATATYPE_CACHE[(table_name, table_attribute)] = (now, column_type)
+            return (True, data_types)
         except Exception as e:
-            traceback.print_exc(sys.exc_info())
-            err_msg = "Error finding data type for column '%s' in table '%s': %s"\
-                    % (table_attribute, table_name, str(e[0]))
-            LOGGER.error(err_msg)
+            LOGGER.exception("Error finding data types for columns %s", pairs)
+            err_msg = "Error finding data types for columns %s: %s"\
+                    % (pairs, str(e))
             return (False, err_msg)
-        finally:
-            conn.close()
+
+    @staticmethod
+    def invalidate_cache(table_name=None):
+        """
+        Clear cached column data types--e.g. after a table is altered or dropped
+
+        If table_name is None, clear the entire cache
+        """
+        if table_name is None:
+            _DATATYPE_CACHE.clear()
+            return
+
+        table_name = table_name.split(':')[-1]
+        for key in list(_DATATYPE_CACHE.keys()):
+            if key[0] == table_name:
+                _DATATYPE_CACHE.pop(key, None)
 
     @staticmethod
     def is_char_column_conversion_recommended(table_name, table_attribute):
@@ -85,7 +172,6 @@ class ColumnHelper(object):
         """
         Check the data_type string against known postgres character datatypes
         """
-        #global POSTGRES_CHAR_DATATYPES
         if data_type is None:
             return False
 
@@ -99,7 +185,6 @@ class ColumnHelper(object):
         """
         Check the data_type string against known postgres numeric datatypes
         """
-        #global POSTGRES_NUMERIC_DATATYPES
         if data_type is None:
             return False
 
@@ -107,3 +192,17 @@ class ColumnHelper(object):
             return True
 
         return False
+
+    @staticmethod
+    def is_character_category(type_category):
+        """
+        Check whether a pg_type.typcategory is the string category
+        """
+        return type_category == TYPE_CATEGORY_STRING
+
+    @staticmethod
+    def is_numeric_category(type_category):
+        """
+        Check whether a pg_type.typcategory is the numeric category
+        """
+        return type_category == TYPE_CATEGORY_NUMERIC
@@ -1,7 +1,14 @@
+import logging
+import threading
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.pool
 from django.conf import settings
 
 from geonode.maps import utils
 
+LOGGER = logging.getLogger('geonode.contrib.datatables.db_helper')
+
 DB_PARAM_NAMES = ['NAME', 'USER', 'PASSWORD', 'PORT', 'HOST']
 
 CHOSEN_DB_SETTING = 'wmdata'
@@ -9,6 +16,12 @@ DATAVERSE_DB = settings.DB_DATAVERSE_NAME
 
 # psql -d wmdata -U wmuser -W
 
+# Shared pool of datastore connections, created on first use
+_POOL = None
+_POOL_LOCK = threading.Lock()
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 8
+
 def get_database_name(is_dataverse_db):
     """
     Determine database to use.
@@ -65,6 +78,83 @@ def get_datastore_connection_string(url_format=False, is_dataverse_db=True, db_n
     return conn_str
 
 
+def get_datastore_connection_pool():
+    """
+    Return a pool of connections to the datastore
+
+    Avoids paying the connection setup cost on every small metadata query.
+
+    Use via datastore_connection(), which also handles a full pool.
+    """
+    global _POOL
+
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = psycopg2.pool.ThreadedConnectionPool(\
+                                POOL_MIN_CONNECTIONS,
+                                POOL_MAX_CONNECTIONS,
+                                dsn=get_datastore_connection_string())
+    return _POOL
+
+
+@contextmanager
+def datastore_connection():
+    """
+    Borrow a datastore connection from the pool
+
+    with datastore_connection() as conn:
+        ...
+
+    The pool doesn't wait for a free connection--getconn() raises PoolError
+    once all of them are in use--so in that case open a one-off connection.
+
+    On an exception the transaction is rolled back before it is re-raised.
+    Closed connections (e.g. after a server restart) are discarded rather
+    than returned to the pool.
+    """
+    pool = get_datastore_connection_pool()
+    try:
+        conn = pool.getconn()
+    except psycopg2.pool.PoolError:
+        LOGGER.warning('Datastore connection pool exhausted, opening a new connection')
+        pool = None
+        conn = psycopg2.connect(get_datastore_connection_string())
+
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if pool is None:
+            conn.close()
+        else:
+            pool.putconn(conn, close=bool(conn.closed))
+
+
+def quote_identifier(name):
+    """
+    Quote a table or column name for use in a SQL statement
+
+    Identifiers can't be passed as query parameters, so wrap the name in
+    double quotes and escape any embedded double quotes.
+
+    e.g. some-table -> "some-table"
+
+    Quoted identifiers are case-sensitive: pass the name exactly as
+    Postgres stores it.  An unquoted MyTable is stored as mytable, so
+    quote_identifier('MyTable') won't find it.
+
+    Raises ValueError if name is None
+    """
+    if name is None:
+        raise ValueError("name cannot be None")
+
+    return '"%s"' % name.replace('"', '""')
+
+
 def get_connection_string_via_settings(setting_db_name, url_format=False, **override_params):
     """Initial use:
     Get the connection string for wmdata based on the django settings file--
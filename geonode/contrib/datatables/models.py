@@ -11,6 +11,7 @@ from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
 
 from .db_helper import get_datastore_connection_string
+from .column_helper import ColumnHelper
 from geonode.contrib.datatables.utils_joins import drop_view_by_name
 
 TRANSFORMATION_FUNCTIONS = []
@@ -94,6 +95,7 @@ dt.as_json()
         conn.commit()
         cur.close()
         conn.close()
+        ColumnHelper.invalidate_cache(self.table_name)
 
 
 class DataTableAttribute(models.Model):
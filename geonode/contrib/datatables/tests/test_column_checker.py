@@ -0,0 +1,98 @@
+from django.utils import unittest
+from mock import patch
+
+from geonode.contrib.datatables.column_checker import ColumnChecker
+from geonode.contrib.datatables.column_helper import ColumnType
+
+
+class ColumnCheckerTestCase(unittest.TestCase):
+    """
+    Check the join column comparisons without querying the datastore
+    """
+    def setUp(self):
+        self.checker = ColumnChecker('geonode:tl_2014_25_tract', 'tractce',\
+                                    'boston_income', 'tract')
+
+    def set_datatypes(self, target_column_type, datatable_column_type):
+        patcher = patch.object(ColumnChecker, '_get_both_datatypes')
+        mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        mock_get.return_value = (True, (ColumnType(*target_column_type),\
+                                        ColumnType(*datatable_column_type)))
+
+    def test_same_type(self):
+
+        self.set_datatypes(('character varying', 'S'), ('character varying', 'S'))
+
+        self.assertEqual(self.checker.are_join_columns_compatible(), (True, None))
+        (success, join_clause) = self.checker.get_column_join_stmt()
+        self.assertTrue(success)
+        self.assertEqual(join_clause,\
+                'geonode:tl_2014_25_tract."tractce" = boston_income."tract"')
+
+    def test_both_numeric(self):
+
+        self.set_datatypes(('integer', 'N'), ('double precision', 'N'))
+
+        self.assertEqual(self.checker.are_join_columns_compatible(), (True, None))
+        self.assertTrue(self.checker.get_column_join_stmt()[0])
+
+    def test_char_target_numeric_datatable(self):
+
+        self.set_datatypes(('character varying', 'S'), ('integer', 'N'))
+
+        (success, err_msg) = self.checker.are_join_columns_compatible()
+        self.assertFalse(success)
+        self.assertTrue(err_msg.find('a "numeric"') > -1)
+
+        # No casting unless asked for
+        (success, err_msg) = self.checker.get_column_join_stmt()
+        self.assertFalse(success)
+
+        # Cast the DataTable column to varchar within the join clause
+        (success, join_clause) = self.checker.get_column_join_stmt(with_casting=True)
+        self.assertTrue(success)
+        self.assertTrue(join_clause.endswith('boston_income."tract"::varchar'))
+
+    def test_numeric_target_char_datatable(self):
+
+        self.set_datatypes(('integer', 'N'), ('text', 'S'))
+
+        join_result = self.checker._evaluate_join(with_casting=True)
+        self.assertFalse(join_result.ok)
+        self.assertEqual(join_result.clause, None)
+        self.assertEqual(join_result.err,\
+                ('<br />Your chosen column "tract" is type a "character".'
+                 '  However, the chosen layer column "tractce" is type a "numeric"'))
+
+    def test_domain_type_uses_category(self):
+
+        # e.g. a domain over varchar, not in POSTGRES_CHAR_DATATYPES
+        self.set_datatypes(('tract_code', 'S'), ('text', 'S'))
+
+        self.assertEqual(self.checker.are_join_columns_compatible(), (True, None))
+
+    def test_same_column(self):
+
+        checker = ColumnChecker('geonode:boston_income', 'tract',\
+                                    'boston_income', 'tract')
+        with patch.object(ColumnChecker, '_get_both_datatypes') as mock_get:
+            self.assertEqual(checker.are_join_columns_compatible(), (True, None))
+            self.assertTrue(checker.get_column_join_stmt()[0])
+            self.assertFalse(mock_get.called)
+
+    def test_datatype_not_retrieved(self):
+
+        with patch.object(ColumnChecker, '_get_both_datatypes') as mock_get:
+            mock_get.return_value = (False, 'The data type of your column was not available')
+
+            (success, err_msg) = self.checker.are_join_columns_compatible()
+            self.assertFalse(success)
+            self.assertEqual(err_msg, 'The data type of your column was not available')
+
+    def test_table_name_not_specified(self):
+
+        checker = ColumnChecker(None, 'tractce', 'boston_income', 'tract')
+        (success, err_msg) = checker.are_join_columns_compatible()
+        self.assertFalse(success)
+        self.assertEqual(err_msg, 'The table_name and table_attribute must be specified.')
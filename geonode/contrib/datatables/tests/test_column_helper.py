@@ -0,0 +1,130 @@
+from django.utils import unittest
+from mock import MagicMock, patch
+
+from psycopg2.pool import PoolError
+
+from geonode.contrib.datatables import column_helper, db_helper
+from geonode.contrib.datatables.column_helper import ColumnHelper, ColumnType,\
+                                                _DATATYPE_CACHE, _CACHE_TTL
+
+
+class ColumnHelperCacheTestCase(unittest.TestCase):
+    """
+    Check the column data type cache, using a fake datastore connection
+    """
+    def setUp(self):
+        ColumnHelper.invalidate_cache()
+        self.addCleanup(ColumnHelper.invalidate_cache)
+
+        self.cursor = MagicMock()
+        self.conn = MagicMock()
+        self.conn.closed = 0
+        self.conn.cursor.return_value = self.cursor
+        self.pool = MagicMock()
+        self.pool.getconn.return_value = self.conn
+
+        pool_patcher = patch.object(db_helper, 'get_datastore_connection_pool',\
+                                    return_value=self.pool)
+        pool_patcher.start()
+        self.addCleanup(pool_patcher.stop)
+
+        self.now = 1000.0
+        time_patcher = patch.object(column_helper.time, 'time',\
+                                    side_effect=lambda: self.now)
+        time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+
+    def set_rows(self, rows):
+        self.cursor.fetchall.return_value = rows
+        self.cursor.execute.reset_mock()
+
+    def queried_pairs(self):
+        """The (table, column) pairs passed to the last query"""
+        return self.cursor.execute.call_args[0][1][0]
+
+    def test_cached_lookup_skips_query(self):
+
+        self.set_rows([('income', 'tract', 'integer', 'N')])
+        (success, data_types) = ColumnHelper.get_column_datatypes_batch(\
+                                    [('geonode:income', 'tract')])
+        self.assertTrue(success)
+        self.assertEqual(data_types, {('income', 'tract'): ColumnType('integer', 'N')})
+        self.assertEqual(self.cursor.execute.call_count, 1)
+
+        self.set_rows([])
+        self.assertEqual(ColumnHelper.get_column_datatype('income', 'tract'),\
+                        (True, 'integer'))
+        self.assertFalse(self.cursor.execute.called)
+
+    def test_only_uncached_pairs_are_queried(self):
+
+        self.set_rows([('income', 'tract', 'integer', 'N')])
+        ColumnHelper.get_column_datatypes_batch([('income', 'tract')])
+
+        self.set_rows([('tracts', 'tractce', 'character varying', 'S')])
+        (success, data_types) = ColumnHelper.get_column_datatypes_batch(\
+                                    [('tracts', 'tractce'), ('income', 'tract')])
+        self.assertTrue(success)
+        self.assertEqual(self.queried_pairs(), (('tracts', 'tractce'),))
+        self.assertEqual(data_types,\
+                {('tracts', 'tractce'): ColumnType('character varying', 'S'),
+                 ('income', 'tract'): ColumnType('integer', 'N')})
+
+    def test_expired_entry_is_dropped_and_requeried(self):
+
+        self.set_rows([('income', 'tract', 'integer', 'N')])
+        ColumnHelper.get_column_datatypes_batch([('income', 'tract')])
+
+        self.now += _CACHE_TTL + 1
+
+        # Column no longer found: the stale entry is dropped, not returned
+        self.set_rows([])
+        (success, data_types) = ColumnHelper.get_column_datatypes_batch(\
+                                    [('income', 'tract')])
+        self.assertTrue(success)
+        self.assertEqual(data_types, {})
+        self.assertEqual(self.queried_pairs(), (('income', 'tract'),))
+        self.assertFalse(('income', 'tract') in _DATATYPE_CACHE)
+
+    def test_invalidate_cache_for_table(self):
+
+        self.set_rows([('income', 'tract', 'integer', 'N'),
+                       ('tracts', 'tractce', 'character varying', 'S')])
+        ColumnHelper.get_column_datatypes_batch(\
+                        [('income', 'tract'), ('tracts', 'tractce')])
+
+        ColumnHelper.invalidate_cache('geonode:income')
+        self.assertFalse(('income', 'tract') in _DATATYPE_CACHE)
+        self.assertTrue(('tracts', 'tractce') in _DATATYPE_CACHE)
+
+    def test_invalidate_entire_cache(self):
+
+        self.set_rows([('income', 'tract', 'integer', 'N'),
+                       ('tracts', 'tractce', 'character varying', 'S')])
+        ColumnHelper.get_column_datatypes_batch(\
+                        [('income', 'tract'), ('tracts', 'tractce')])
+
+        ColumnHelper.invalidate_cache()
+        self.assertEqual(_DATATYPE_CACHE, {})
+
+    def test_full_pool_opens_one_off_connection(self):
+
+        self.pool.getconn.side_effect = PoolError('connection pool exhausted')
+        self.set_rows([('income', 'tract', 'integer', 'N')])
+
+        with patch.object(db_helper.psycopg2, 'connect', return_value=self.conn),\
+                patch.object(db_helper, 'get_datastore_connection_string'):
+            (success, data_types) = ColumnHelper.get_column_datatypes_batch(\
+                                        [('income', 'tract')])
+
+        self.assertTrue(success)
+        self.assertEqual(data_types, {('income', 'tract'): ColumnType('integer', 'N')})
+        self.assertTrue(self.conn.close.called)
+        self.assertFalse(self.pool.putconn.called)
+
+    def test_connection_returned_to_pool(self):
+
+        self.set_rows([('income', 'tract', 'integer', 'N')])
+        ColumnHelper.get_column_datatypes_batch([('income', 'tract')])
+
+        self.pool.putconn.assert_called_once_with(self.conn, close=False)
@@ -0,0 +1,25 @@
+from django.utils import unittest
+
+from geonode.contrib.datatables.db_helper import quote_identifier
+
+
+class QuoteIdentifierTestCase(unittest.TestCase):
+
+    def test_name_is_double_quoted(self):
+
+        self.assertEqual(quote_identifier('boston_income'), '"boston_income"')
+        self.assertEqual(quote_identifier('some-table'), '"some-table"')
+
+    def test_case_is_preserved(self):
+
+        self.assertEqual(quote_identifier('MyTable'), '"MyTable"')
+
+    def test_embedded_double_quotes_are_escaped(self):
+
+        self.assertEqual(quote_identifier('my "table"'), '"my ""table"""')
+        self.assertEqual(quote_identifier('x"; DROP TABLE y; --'),\
+                        '"x""; DROP TABLE y; --"')
+
+    def test_none_raises(self):
+
+        self.assertRaises(ValueError, quote_identifier, None)
@@ -25,6 +25,7 @@ from geonode.maps.models import Layer, LayerAttribute
 from geonode.contrib.datatables.models import DataTable, DataTableAttribute, TableJoin
 from geonode.contrib.datatables.forms import DataTableUploadForm, TableJoinRequestForm
 from geonode.contrib.datatables.column_checker import ColumnChecker
+from geonode.contrib.datatables.column_helper import ColumnHelper
 from geonode.contrib.datatables.name_helper import get_unique_tablename,\
     standardize_column_name,\
     get_unique_viewname,\
@@ -169,6 +170,7 @@ def process_csv_file(data_table,
         cur.execute(create_table_sql)
         conn.commit()
         cur.close()
+        ColumnHelper.invalidate_cache(table_name)
     except Exception as e:
         traceback.print_exc(sys.exc_info())
         err_msg = "Error Creating table %s:%s" % (data_table.name, str(e))
@@ -2,7 +2,6 @@ from django.db import models
 from django.db.models import signals
 from django.conf import settings
 from geonode.maps.models import Map
-from geonode.hoods.views import update_hood_map
 import logging
 
 # Create your models here.
@@ -12,6 +11,8 @@ logger = logging.getLogger("geonode.hoods.models")
 def post_save_map(instance, sender, **kwargs):
     if instance.officialurl == 'boston' and settings.HOODS_TEMPLATE_ID is not None:
         logger.info("Update hood map")
+        # imported here so loading the models doesn't pull in the views
+        from geonode.hoods.views import update_hood_map
         update_hood_map()
     else:
         logger.info("Dont update hood map")
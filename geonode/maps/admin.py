@@ -2,6 +2,7 @@ from geonode.maps.models import (Map, Layer, MapLayer, LayerCategory, LayerAttri
     Contact, ContactRole, Role, MapStats, LayerStats, Endpoint, MapSnapshot)
 from django.contrib.contenttypes.models import ContentType
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.http import HttpResponseRedirect
 from django.core.urlresolvers import reverse
 from dialogos.models import Comment
@@ -9,38 +10,77 @@ from django.contrib.contenttypes import generic
 from agon_ratings.models import OverallRating, Rating
 import autocomplete_light
 
+# autocomplete_light forms, built on first use rather than at import time
+_AUTOCOMPLETE_FORMS = {}
+
+def get_autocomplete_form(model):
+    if model not in _AUTOCOMPLETE_FORMS:
+        _AUTOCOMPLETE_FORMS[model] = autocomplete_light.modelform_factory(model)
+    return _AUTOCOMPLETE_FORMS[model]
+
+class AutocompleteAdminMixin(object):
+    """Use an autocomplete_light form for the ModelAdmin's model"""
+    def get_form(self, request, obj=None, **kwargs):
+        kwargs.setdefault('form', get_autocomplete_form(self.model))
+        return super(AutocompleteAdminMixin, self).get_form(request, obj, **kwargs)
+
+class AutocompleteInlineMixin(object):
+    """Use an autocomplete_light form for the inline's model"""
+    def get_formset(self, request, obj=None, **kwargs):
+        # generic inlines don't accept a 'form' keyword argument
+        self.form = get_autocomplete_form(self.model)
+        return super(AutocompleteInlineMixin, self).get_formset(request, obj, **kwargs)
+
+class SelectRelatedChangeList(ChangeList):
+    """
+    Follow the ModelAdmin's select_related_fields in the changelist query.
+
+    (list_select_related must be a boolean here and select_related()
+    without field names skips nullable foreign keys.)
+    """
+    def get_query_set(self, request):
+        qs = super(SelectRelatedChangeList, self).get_query_set(request)
+        if self.model_admin.select_related_fields:
+            qs = qs.select_related(*self.model_admin.select_related_fields)
+        return qs
+
+class SelectRelatedAdminMixin(object):
+    """Avoid a query per changelist row for the foreign keys in list_display"""
+    select_related_fields = ()
+
+    def get_changelist(self, request, **kwargs):
+        return SelectRelatedChangeList
+
 class MapLayerInline(admin.TabularInline):
     model = MapLayer
     extra = 0
 
-class ContactRoleInline(admin.TabularInline):
+class ContactRoleInline(AutocompleteInlineMixin, admin.TabularInline):
     model = ContactRole
     extra = 0
-    form = autocomplete_light.modelform_factory(ContactRole)
 
 class MapOverallRatingInline(generic.GenericTabularInline):
     model = OverallRating
     extra = 0
 
-class MapRatingInline(generic.GenericTabularInline):
+class MapRatingInline(AutocompleteInlineMixin, generic.GenericTabularInline):
     model = Rating
     extra = 0
-    form = autocomplete_light.modelform_factory(Rating)
 
-class ContactRoleAdmin(admin.ModelAdmin):
+class ContactRoleAdmin(AutocompleteAdminMixin, SelectRelatedAdminMixin, admin.ModelAdmin):
     model = ContactRole
     list_display_links = ('id',)
     list_display = ('id','contact', 'layer', 'role')
+    select_related_fields = ('contact', 'layer', 'role')
     list_editable = ('layer', 'role')
     search_fields = ['contact__name','layer__name']
-    form = autocomplete_light.modelform_factory(ContactRole)
 
 def remove_map_owners(modeladmin, request, queryset):
     ids = queryset.all().values_list('id', flat=True)
     return HttpResponseRedirect("/users_remove/?ids=%s" % ','.join(str(id) for id in ids))
 remove_map_owners.short_description = "Remove the owners of the selected maps"
 
-class MapAdmin(admin.ModelAdmin):
+class MapAdmin(AutocompleteAdminMixin, admin.ModelAdmin):
     inlines = [MapLayerInline,MapOverallRatingInline,MapRatingInline]
     list_display = ('id', 'title','owner','created_dttm', 'last_modified')
     list_filter  = ('created_dttm','owner')
@@ -48,15 +88,14 @@ class MapAdmin(admin.ModelAdmin):
     search_fields = ['title', 'abstract', 'content', 'keywords__name']
     actions = [remove_map_owners]
     ordering = ('-created_dttm',)
-    form = autocomplete_light.modelform_factory(Map)
 
-class ContactAdmin(admin.ModelAdmin):
+class ContactAdmin(AutocompleteAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'name', 'user')
     search_fields = ['name']
-    form = autocomplete_light.modelform_factory(Contact)
 
-class LayerAdmin(admin.ModelAdmin):
+class LayerAdmin(AutocompleteAdminMixin, SelectRelatedAdminMixin, admin.ModelAdmin):
     list_display = ('id','title', 'store', 'name', 'date', 'owner', 'topic_category', 'add_as_join_target')
+    select_related_fields = ('owner', 'topic_category')
     list_display_links = ('id',)
     list_editable = ('title', 'topic_category')
     list_filter  = ('date', 'date_type', 'constraints_use', 'topic_category', 'owner')
@@ -67,7 +106,6 @@ class LayerAdmin(admin.ModelAdmin):
     search_fields = ['typename','title']
     actions = ['change_poc']
     ordering = ('-date',)
-    form = autocomplete_light.modelform_factory(Layer)
 
 class LayerCategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'title')
@@ -102,15 +140,20 @@ class MapSnapshotAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_dttm'
 
 
-admin.site.register(Map, MapAdmin)
-admin.site.register(Contact, ContactAdmin)
-admin.site.register(Layer, LayerAdmin)
-admin.site.register(LayerCategory, LayerCategoryAdmin)
-admin.site.register(LayerAttribute, LayerAttributeAdmin)
-admin.site.register(ContactRole, ContactRoleAdmin)
-admin.site.register(MapLayer,MapLayerAdmin)
-admin.site.register(Role)
-admin.site.register(MapStats, MapStatsAdmin)
-admin.site.register(LayerStats, LayerStatsAdmin)
-admin.site.register(Endpoint, EndpointAdmin)
-admin.site.register(MapSnapshot, MapSnapshotAdmin)
+ADMIN_REGISTRY = (
+    (Map, MapAdmin),
+    (Contact, ContactAdmin),
+    (Layer, LayerAdmin),
+    (LayerCategory, LayerCategoryAdmin),
+    (LayerAttribute, LayerAttributeAdmin),
+    (ContactRole, ContactRoleAdmin),
+    (MapLayer, MapLayerAdmin),
+    (Role, None),
+    (MapStats, MapStatsAdmin),
+    (LayerStats, LayerStatsAdmin),
+    (Endpoint, EndpointAdmin),
+    (MapSnapshot, MapSnapshotAdmin),
+)
+
+for model, model_admin in ADMIN_REGISTRY:
+    admin.site.register(model, model_admin)